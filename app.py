@@ -1,11 +1,21 @@
 import streamlit as st
-import plotly.express as px
-import plotly.graph_objects as go
-import pandas as pd
-from llm_api import generate_questions, generate_report
-from config import SKILL_CATEGORIES, CATEGORY_DETAILS, CORRECT_ANSWERS, SCORE_THRESHOLDS
+import numpy as np
+from llm_api import generate_questions, prefetch_questions, generate_report_stream
+from config import SKILL_CATEGORIES, CATEGORY_DETAILS, SCORE_THRESHOLDS
+from scoring import compute_summary
 
+# Lower bound of each score band, with the matching emoji
+SCORE_BANDS = np.array([0, SCORE_THRESHOLDS["Average"], SCORE_THRESHOLDS["Good"], SCORE_THRESHOLDS["Excellent"]])
+SCORE_EMOJIS = np.array(["❌", "⚠️", "✅", "🌟"])
+
+def score_band(scores):
+    """Index into SCORE_BANDS for a score or array of scores"""
+    return np.searchsorted(SCORE_BANDS, scores, side="right") - 1
+
+@st.cache_data(ttl=3600, show_spinner=False)
 def create_speedometer_chart(score):
+    import plotly.graph_objects as go
+    
     fig = go.Figure(go.Indicator(
         mode = "gauge+number",
         value = score,
@@ -24,7 +34,10 @@ def create_speedometer_chart(score):
     ))
     return fig
 
+@st.cache_data(ttl=3600, show_spinner=False)
 def create_pie_chart(scores):
+    import plotly.express as px
+    
     fig = px.pie(
         values=list(scores.values()),
         names=list(scores.keys()),
@@ -33,7 +46,10 @@ def create_pie_chart(scores):
     )
     return fig
 
+@st.cache_data(ttl=3600, show_spinner=False)
 def create_bar_chart(scores):
+    import plotly.express as px
+    
     fig = px.bar(
         x=list(scores.keys()),
         y=list(scores.values()),
@@ -45,7 +61,10 @@ def create_bar_chart(scores):
     fig.update_layout(xaxis_tickangle=-45)
     return fig
 
+@st.cache_data(ttl=3600, show_spinner=False)
 def create_radar_chart(scores):
+    import plotly.graph_objects as go
+    
     categories = list(scores.keys())
     values = list(scores.values())
     
@@ -73,10 +92,16 @@ def initialize_session_state():
         st.session_state.questions = {}
     if 'answers' not in st.session_state:
         st.session_state.answers = {}
+    if 'correct_answers' not in st.session_state:
+        st.session_state.correct_answers = {}
     if 'current_category_index' not in st.session_state:
         st.session_state.current_category_index = 0
     if 'current_question_index' not in st.session_state:
         st.session_state.current_question_index = 0
+    if 'last_feedback' not in st.session_state:
+        st.session_state.last_feedback = None
+    if 'question_futures' not in st.session_state:
+        st.session_state.question_futures = {}
 
 def display_student_info_form():
     st.header("Student Information")
@@ -102,26 +127,88 @@ def display_student_info_form():
             else:
                 st.error("Please fill in all required fields.")
 
+def store_questions(category, questions):
+    st.session_state.questions[category] = questions
+    st.session_state.correct_answers[category] = [q["correct"] for q in questions]
+
 def display_test():
+    # On first entry, start the later categories in the background while the
+    # first one is generated for the user straight away
+    if not st.session_state.questions and not st.session_state.question_futures:
+        st.session_state.question_futures = prefetch_questions(SKILL_CATEGORIES[1:])
+    
+    _test_fragment()
+
+def _submit_answer(category, question, answer_key):
+    # Runs before the rerun triggered by the submit button, so that rerun
+    # already renders the next question
+    answer = st.session_state[answer_key]
+    if category not in st.session_state.answers:
+        st.session_state.answers[category] = []
+    st.session_state.answers[category].append(answer)
+    
+    # Keep the result to show above the next question
+    st.session_state.last_feedback = {
+        "correct": answer == question["correct"],
+        "correct_option": question["options"][question["correct"]],
+        "explanation": question.get("explanation")
+    }
+    
+    # Move to next question or category
+    if st.session_state.current_question_index < 4:
+        st.session_state.current_question_index += 1
+    else:
+        st.session_state.current_question_index = 0
+        st.session_state.current_category_index += 1
+        
+        if st.session_state.current_category_index >= len(SKILL_CATEGORIES):
+            st.session_state.current_phase = "generate_report"
+
+@st.fragment
+def _test_fragment():
+    # Answering a question reruns only this fragment; the whole script is
+    # rerun just once, to hand over to the report after the last answer
+    if st.session_state.current_phase != "generate_questions":
+        st.rerun()
+    
     current_category = SKILL_CATEGORIES[st.session_state.current_category_index]
     
     # Generate questions if not already generated
     if current_category not in st.session_state.questions:
         with st.spinner(f"Generating questions for {current_category}..."):
-            questions = generate_questions(current_category)
+            # Use the prefetched questions, waiting if they are still on the way
+            future = st.session_state.question_futures.pop(current_category, None)
+            questions = future.result() if future is not None else None
+            # Nothing prefetched, or the prefetch failed: ask again before
+            # falling back to the default questions
+            if questions is None:
+                questions = generate_questions(current_category)
             if isinstance(questions, str):  # Error message
                 st.error(f"Error generating questions: {questions}")
                 return
-            st.session_state.questions[current_category] = questions
-
+            store_questions(current_category, questions)
+    
     # Display progress
     st.header(f"Assessment: {current_category}")
     progress = (st.session_state.current_category_index * 5 + st.session_state.current_question_index + 1) / (len(SKILL_CATEGORIES) * 5)
     st.progress(progress)
     st.write(f"Question {st.session_state.current_question_index + 1} of 5")
     
+    # Show if the previous answer was correct and explanation
+    feedback = st.session_state.last_feedback
+    if feedback:
+        if feedback["correct"]:
+            st.success("✅ Correct!")
+        else:
+            st.error(f"❌ Incorrect. The correct answer was: {feedback['correct_option']}")
+        
+        if feedback["explanation"]:
+            st.info(f"Explanation: {feedback['explanation']}")
+    
+    current_question = None
     try:
         current_question = st.session_state.questions[current_category][st.session_state.current_question_index]
+        answer_key = f"answer_{st.session_state.current_category_index}_{st.session_state.current_question_index}"
         
         with st.form("question_form"):
             st.write("### Question:")
@@ -129,39 +216,20 @@ def display_test():
             if "focus_area" in current_question:
                 st.write(f"*Focus Area: {current_question['focus_area']}*")
             
-            answer = st.radio(
+            st.radio(
                 "Select your answer:",
                 list(current_question["options"].keys()),
-                format_func=lambda x: current_question["options"][x]
+                format_func=lambda x: current_question["options"][x],
+                key=answer_key
             )
             
             col1, col2, col3 = st.columns([1, 1, 1])
             with col2:
-                if st.form_submit_button("Next Question"):
-                    # Store answer
-                    if current_category not in st.session_state.answers:
-                        st.session_state.answers[current_category] = []
-                    st.session_state.answers[current_category].append(answer)
-                    
-                    # Show if answer was correct and explanation
-                    if answer == current_question["correct"]:
-                        st.success("✅ Correct!")
-                    else:
-                        st.error(f"❌ Incorrect. The correct answer was: {current_question['options'][current_question['correct']]}")
-                    
-                    if "explanation" in current_question:
-                        st.info(f"Explanation: {current_question['explanation']}")
-                    
-                    # Move to next question or category
-                    if st.session_state.current_question_index < 4:
-                        st.session_state.current_question_index += 1
-                    else:
-                        st.session_state.current_question_index = 0
-                        st.session_state.current_category_index += 1
-                        
-                        if st.session_state.current_category_index >= len(SKILL_CATEGORIES):
-                            st.session_state.current_phase = "generate_report"
-                    st.rerun()
+                st.form_submit_button(
+                    "Next Question",
+                    on_click=_submit_answer,
+                    args=(current_category, current_question, answer_key)
+                )
                     
     except Exception as e:
         st.error(f"Error displaying question: {str(e)}")
@@ -172,16 +240,18 @@ def calculate_scores():
     for category in SKILL_CATEGORIES:
         category_answers = st.session_state.answers.get(category, [])
         if category_answers:
-            correct_count = sum(
-                1 for i, ans in enumerate(category_answers)
-                if ans == CORRECT_ANSWERS[f"{category}_{i}"]
-            )
-            scores[category] = (correct_count / len(category_answers)) * 100
+            answers = np.array(category_answers)
+            correct = np.array(st.session_state.correct_answers[category][:len(answers)])
+            scores[category] = float((answers == correct).mean() * 100)
     return scores
 
 def display_report():
+    # Pandas and Plotly are only needed on the report page, so they are
+    # imported on first use instead of at startup
+    import pandas as pd
+    
     scores = calculate_scores()
-    overall_score = sum(scores.values()) / len(scores)
+    summary = compute_summary(scores)
     
     st.header("Skill Gap Analysis Report")
     
@@ -201,53 +271,33 @@ def display_report():
     # Speedometer and Radar charts
     col1, col2 = st.columns(2)
     with col1:
-        st.plotly_chart(create_speedometer_chart(overall_score))
+        st.plotly_chart(create_speedometer_chart(summary.avg), key="speedometer_chart")
     with col2:
-        st.plotly_chart(create_radar_chart(scores))
+        st.plotly_chart(create_radar_chart(scores), key="radar_chart")
     
     # Pie and Bar charts
     col1, col2 = st.columns(2)
     with col1:
-        st.plotly_chart(create_pie_chart(scores))
+        st.plotly_chart(create_pie_chart(scores), key="pie_chart")
     with col2:
-        st.plotly_chart(create_bar_chart(scores))
+        st.plotly_chart(create_bar_chart(scores), key="bar_chart")
     
     # Detailed scores
     st.subheader("Detailed Scores")
     score_df = pd.DataFrame(list(scores.items()), columns=['Category', 'Score'])
     
-    # Format the scores with color coding using custom HTML
-    def color_score(score):
-        if score >= SCORE_THRESHOLDS["Excellent"]:
-            color = "green"
-        elif score >= SCORE_THRESHOLDS["Good"]:
-            color = "lightgreen"
-        elif score >= SCORE_THRESHOLDS["Average"]:
-            color = "yellow"
-        else:
-            color = "red"
-        return f'background-color: {color}'
-    
-    # Display scores with custom formatting
+    # Display scores as a single table colored by score
     st.write("### Score Breakdown")
-    for idx, row in score_df.iterrows():
-        score = row['Score']
-        if score >= SCORE_THRESHOLDS["Excellent"]:
-            emoji = "🌟"
-        elif score >= SCORE_THRESHOLDS["Good"]:
-            emoji = "✅"
-        elif score >= SCORE_THRESHOLDS["Average"]:
-            emoji = "⚠️"
-        else:
-            emoji = "❌"
-        
-        st.write(f"{emoji} **{row['Category']}:** {score:.1f}%")
+    styled = (score_df
+              .assign(Rating=SCORE_EMOJIS[score_band(score_df['Score'].to_numpy())])
+              .style
+              .background_gradient(subset=["Score"], cmap="RdYlGn", vmin=0, vmax=100)
+              .format({"Score": "{:.1f}%"}))
+    st.dataframe(styled, use_container_width=True, hide_index=True)
     
     # Generate and display detailed report
     st.subheader("Detailed Analysis")
-    with st.spinner("Generating detailed report..."):
-        report = generate_report(scores, st.session_state.student_info)
-        st.markdown(report)
+    report = st.write_stream(generate_report_stream(scores, st.session_state.student_info, summary))
     
     # Download options
     st.subheader("Download Report")
@@ -269,7 +319,7 @@ Email: {st.session_state.student_info['email']}
 Department: {st.session_state.student_info['department']}
 Year: {st.session_state.student_info['year']}
 
-## Overall Score: {overall_score:.1f}%
+## Overall Score: {summary.avg:.1f}%
 
 ## Detailed Scores
 {score_df.to_markdown()}
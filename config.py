@@ -46,8 +46,8 @@ CATEGORY_DETAILS = {
     }
 }
 
-# Dictionary to store correct answers
-CORRECT_ANSWERS = {}
+# Directory for cached LLM responses
+LLM_CACHE_DIR = ".llm_cache"
 
 # Scoring thresholds
 SCORE_THRESHOLDS = {
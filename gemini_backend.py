@@ -0,0 +1,74 @@
+import os
+import threading
+from typing import Dict, Iterator, Optional, Sequence, Tuple
+from phi.agent import Agent
+from phi.model.google import Gemini
+
+def _to_gemini_schema(schema: Dict) -> Dict:
+    """Translate JSON Schema keywords to the field names Gemini expects"""
+    converted = {}
+    for key, value in schema.items():
+        if key == "minItems":
+            converted["min_items"] = value
+        elif key == "maxItems":
+            converted["max_items"] = value
+        elif key == "items":
+            converted[key] = _to_gemini_schema(value)
+        elif key == "properties":
+            converted[key] = {name: _to_gemini_schema(prop) for name, prop in value.items()}
+        else:
+            converted[key] = value
+    # Gemini only honours enum on strings marked with the enum format
+    if "enum" in converted:
+        converted["format"] = "enum"
+    return converted
+
+class GeminiBackend:
+    """Gemini through phi agents"""
+
+    def __init__(self, model_id: str = "gemini-2.0-flash"):
+        self.api_key = os.getenv("GOOGLE_API_KEY")
+        if not self.api_key:
+            raise ValueError("GOOGLE_API_KEY not found in environment variables")
+        self.model_id = model_id
+        self.cache_id = f"gemini:{model_id}"
+        # Agents keep per-run state, so each thread gets its own
+        self._local = threading.local()
+
+    def _get_agent(self, schema: Optional[Dict] = None) -> Agent:
+        if not hasattr(self._local, "agents"):
+            self._local.agents = {}
+        agents = self._local.agents
+        # Schemas are module-level constants, so identity is a stable key
+        key = id(schema) if schema is not None else None
+        if key not in agents:
+            if schema is None:
+                agents[key] = Agent(
+                    model=Gemini(api_key=self.api_key, id=self.model_id),
+                    markdown=True,
+                )
+            else:
+                # Constrains sampling to the schema so replies always parse
+                agents[key] = Agent(
+                    model=Gemini(
+                        api_key=self.api_key,
+                        id=self.model_id,
+                        generation_config={
+                            "response_mime_type": "application/json",
+                            "response_schema": _to_gemini_schema(schema),
+                        },
+                    ),
+                )
+        return agents[key]
+
+    def complete(self, prompt: str, schema: Optional[Dict] = None,
+                 examples: Sequence[Tuple[str, str]] = ()) -> str:
+        messages = []
+        for request, reply in examples:
+            messages.append({"role": "user", "content": request})
+            messages.append({"role": "assistant", "content": reply})
+        return self._get_agent(schema).run(prompt, messages=messages).content
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        for chunk in self._get_agent().run(prompt, stream=True):
+            yield chunk.content or ""
@@ -0,0 +1,65 @@
+import os
+import httpx
+import orjson
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+from groq import Groq
+
+class GroqBackend:
+    """Groq chat completions"""
+
+    def __init__(self, model_id: str = "llama-3.3-70b-versatile",
+                 json_model_id: str = "llama-3.1-8b-instant"):
+        api_key = os.getenv("GROQ_API_KEY")
+        if not api_key:
+            raise ValueError("GROQ_API_KEY not found in environment variables")
+        self.model_id = model_id
+        # Schema-constrained calls are short and guided by examples, so they
+        # run on the much faster small model; long-form text stays on model_id
+        self.json_model_id = json_model_id
+        self.cache_id = f"groq:{model_id}:{json_model_id}"
+        # One pooled HTTP/2 client, shared by the prefetch threads, so
+        # requests reuse open connections instead of a handshake each
+        self.client = Groq(
+            api_key=api_key,
+            http_client=httpx.Client(
+                http2=True,
+                limits=httpx.Limits(max_keepalive_connections=16, max_connections=32),
+                timeout=30,
+            ),
+        )
+
+    def _messages(self, prompt: str, schema: Optional[Dict] = None,
+                  examples: Sequence[Tuple[str, str]] = ()) -> List[Dict]:
+        messages = []
+        if schema is not None:
+            # JSON mode needs the expected shape spelled out in the prompt
+            messages.append({
+                "role": "system",
+                "content": f"Respond only with a JSON object matching this JSON schema: {orjson.dumps(schema).decode()}"
+            })
+        for request, reply in examples:
+            messages.append({"role": "user", "content": request})
+            messages.append({"role": "assistant", "content": reply})
+        messages.append({"role": "user", "content": prompt})
+        return messages
+
+    def complete(self, prompt: str, schema: Optional[Dict] = None,
+                 examples: Sequence[Tuple[str, str]] = ()) -> str:
+        kwargs = {}
+        if schema is not None:
+            kwargs["response_format"] = {"type": "json_object"}
+        response = self.client.chat.completions.create(
+            model=self.model_id if schema is None else self.json_model_id,
+            messages=self._messages(prompt, schema, examples),
+            **kwargs
+        )
+        return response.choices[0].message.content
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        response = self.client.chat.completions.create(
+            model=self.model_id,
+            messages=self._messages(prompt),
+            stream=True
+        )
+        for chunk in response:
+            yield chunk.choices[0].delta.content or ""
@@ -1,127 +1,263 @@
 import os
-import json
+import orjson
 import random
-from typing import Dict, Any, List
+import hashlib
+import tempfile
+from string import Template
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Iterator, Protocol, Sequence, Tuple
 from dotenv import load_dotenv
-from phi.agent import Agent
-from phi.model.google import Gemini
-from config import CATEGORY_DETAILS, CORRECT_ANSWERS
+from config import SKILL_CATEGORIES, CATEGORY_DETAILS, LLM_CACHE_DIR
+from scoring import Summary, compute_summary
 
 # Load environment variables
 load_dotenv()
 
-# Get API key from environment
-api_key = os.getenv("GOOGLE_API_KEY")
-if not api_key:
-    raise ValueError("GOOGLE_API_KEY not found in environment variables")
+class LLMBackend(Protocol):
+    """Interface each LLM provider module implements"""
 
-# Initialize Gemini agent with API key
-agent = Agent(
-    model=Gemini(api_key=api_key, id="gemini-2.0-flash"),
-    markdown=True,
-)
+    # Identifies the provider and models, so cached replies from one
+    # backend are never served for another
+    cache_id: str
+
+    def complete(self, prompt: str, schema: Optional[Dict] = None,
+                 examples: Sequence[Tuple[str, str]] = ()) -> str:
+        """Return the full reply, constrained to the JSON schema if given.
+        
+        examples are (request, reply) pairs shown to the model as earlier
+        turns of the conversation before the prompt.
+        """
+        ...
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        """Yield the reply in chunks as it is generated"""
+        ...
+
+def _load_backend() -> LLMBackend:
+    # Only the selected provider's SDK is imported
+    provider = os.getenv("LLM_PROVIDER", "gemini").lower()
+    if provider == "gemini":
+        from gemini_backend import GeminiBackend
+        return GeminiBackend()
+    if provider == "groq":
+        from groq_backend import GroqBackend
+        return GroqBackend()
+    raise ValueError(f"Unsupported LLM_PROVIDER: {provider}")
+
+backend = _load_backend()
+
+# In-process layer over the on-disk response cache
+_response_cache: Dict[str, str] = {}
+
+def _cache_key(prompt: str) -> str:
+    return hashlib.sha256(f"{backend.cache_id}\n{prompt}".encode()).hexdigest()
+
+def _cache_path(key: str) -> str:
+    return os.path.join(LLM_CACHE_DIR, f"{key}.txt")
+
+def _cache_get(key: str) -> Optional[str]:
+    """Return a cached LLM response, checking memory first and then disk"""
+    if key in _response_cache:
+        return _response_cache[key]
+    path = _cache_path(key)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            content = f.read()
+    except OSError:
+        return None
+    _response_cache[key] = content
+    return content
+
+def _cache_put(key: str, content: str) -> None:
+    """Store an LLM response in memory and on disk"""
+    _response_cache[key] = content
+    try:
+        os.makedirs(LLM_CACHE_DIR, exist_ok=True)
+        # Write to a temp file and swap it in, so readers never see a
+        # partially written entry
+        fd, tmp_path = tempfile.mkstemp(dir=LLM_CACHE_DIR, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(content)
+            os.replace(tmp_path, _cache_path(key))
+        except OSError:
+            os.remove(tmp_path)
+            raise
+    except OSError as e:
+        print(f"Could not write response cache: {e}")
+
+def _cache_delete(key: str) -> None:
+    """Evict an LLM response from memory and disk"""
+    _response_cache.pop(key, None)
+    try:
+        os.remove(_cache_path(key))
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        print(f"Could not evict response cache entry: {e}")
+
+# Option labels, in display order
+LETTERS = ("a", "b", "c", "d")
+
+# Questions generated per category
+QUESTION_COUNT = 5
 
 def shuffle_options(question: Dict) -> Dict:
-    """Shuffle options while keeping track of the correct answer"""
-    options = list(question["options"].items())
-    correct_letter = question["correct"]
-    correct_answer = question["options"][correct_letter]
-    
-    # Shuffle the options
-    random.shuffle(options)
+    """Shuffle options in place while keeping track of the correct answer"""
+    values = list(question["options"].values())
+    correct_answer = question["options"][question["correct"]]
     
-    # Create new options dictionary
-    new_options = {}
-    new_correct = None
+    random.shuffle(values)
     
-    for i, (_, answer) in enumerate(options):
-        letter = chr(97 + i)  # 'a', 'b', 'c', 'd'
-        new_options[letter] = answer
-        if answer == correct_answer:
-            new_correct = letter
-    
-    # Update the question
-    question["options"] = new_options
-    question["correct"] = new_correct
+    question["options"] = dict(zip(LETTERS, values))
+    question["correct"] = LETTERS[values.index(correct_answer)]
     
     return question
 
-def generate_questions(category: str) -> List[Dict]:
-    try:
-        category_info = CATEGORY_DETAILS[category]
-        focus_areas = category_info["focus_areas"]
-        
-        prompt = f"""Generate 5 multiple-choice questions for assessing {category}.
-        Category Description: {category_info['description']}
+# Shape of a generate_questions reply, enforced by the model's JSON mode
+QUESTIONS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "questions": {
+            "type": "array",
+            "minItems": QUESTION_COUNT,
+            "maxItems": QUESTION_COUNT,
+            "items": {
+                "type": "object",
+                "properties": {
+                    "question": {"type": "string"},
+                    "focus_area": {"type": "string"},
+                    "options": {
+                        "type": "object",
+                        "properties": {letter: {"type": "string"} for letter in LETTERS},
+                        "required": list(LETTERS),
+                    },
+                    "correct": {"type": "string", "enum": list(LETTERS)},
+                    "explanation": {"type": "string"},
+                },
+                "required": ["question", "focus_area", "options", "correct", "explanation"],
+            },
+        },
+    },
+    "required": ["questions"],
+}
+
+def _build_question_prompt(category: str, description: str, focus_areas: List[str], count: int = QUESTION_COUNT) -> str:
+    questions = "question" if count == 1 else "questions"
+    
+    return f"""Generate {count} multiple-choice {questions} for assessing {category}.
+        Category Description: {description}
         Focus Areas: {', '.join(focus_areas)}
 
         Each question should:
         1. Test one of the focus areas mentioned above
         2. Present a realistic workplace scenario
         3. Have exactly 4 options labeled a, b, c, d
-        4. Have exactly one correct answer
+        4. Have exactly one correct answer, given as its option letter
         5. Include an explanation for the correct answer
 
-        Return the response in the following JSON format:
-        [
-            {{
-                "question": "What would you do in this workplace scenario...?",
-                "focus_area": "one of the focus areas",
-                "options": {{
-                    "a": "First option description",
-                    "b": "Second option description",
-                    "c": "Third option description",
-                    "d": "Fourth option description"
-                }},
-                "correct": "a",
-                "explanation": "Explanation why this is the correct answer"
-            }}
-        ]
-
-        Ensure all options are properly labeled with lowercase letters (a, b, c, d) and the correct answer matches one of these letters.
-        Return only the JSON array, no additional text or formatting.
         """
 
-        # Get response from Gemini
-        run = agent.run(prompt)
-        content = run.content
+# Question prompts only depend on the category, so build them once
+QUESTION_PROMPTS = {
+    category: _build_question_prompt(
+        category,
+        CATEGORY_DETAILS[category]["description"],
+        CATEGORY_DETAILS[category]["focus_areas"],
+    )
+    for category in SKILL_CATEGORIES
+}
+
+# Worked example sent ahead of every question request, so smaller models
+# stick to the expected shape and style
+QUESTION_EXAMPLES = [(
+    _build_question_prompt(
+        "Customer Service Skills",
+        "Skills for handling customer interactions",
+        ["Active Listening", "Conflict Resolution"],
+        count=1,
+    ),
+    orjson.dumps({"questions": [{
+        "question": "A customer calls, upset that their order arrived damaged, and interrupts you as you start explaining the returns policy. What should you do?",
+        "focus_area": "Conflict Resolution",
+        "options": {
+            "a": "Continue explaining the policy so they understand their options",
+            "b": "Let them finish, acknowledge the problem, then offer a replacement or refund",
+            "c": "Transfer the call to a supervisor straight away",
+            "d": "Ask them to email the details so there is a written record"
+        },
+        "correct": "b",
+        "explanation": "Letting an upset customer finish and acknowledging the issue de-escalates the conversation before moving to a concrete resolution."
+    }]}).decode(),
+)]
+
+def fetch_questions(category: str) -> Optional[List[Dict]]:
+    """Generate questions for a category, or None if the LLM gave nothing usable"""
+    try:
+        prompt = QUESTION_PROMPTS[category]
+        
+        # Reuse a previous response for the same prompt if we have one
+        cache_key = _cache_key(prompt)
+        content = _cache_get(cache_key)
+        cached = content is not None
         
-        # Clean the response if needed
-        content = content.replace("```json", "").replace("```", "").strip()
+        if not cached:
+            # Get response from the LLM
+            content = backend.complete(prompt, schema=QUESTIONS_SCHEMA, examples=QUESTION_EXAMPLES)
         
         try:
             # Parse the JSON response
-            questions = json.loads(content)
+            questions = orjson.loads(content)["questions"]
             
-            # Validate and shuffle each question
-            shuffled_questions = []
+            # Validate question format
+            if len(questions) != QUESTION_COUNT:
+                raise ValueError(f"Expected {QUESTION_COUNT} questions, got {len(questions)}")
             for i, q in enumerate(questions):
-                # Validate question format
                 required_keys = ["question", "options", "correct", "explanation"]
                 if not all(key in q for key in required_keys):
                     raise ValueError(f"Question {i+1} is missing required keys")
                 if not isinstance(q["options"], dict):
                     raise ValueError(f"Question {i+1} options is not a dictionary")
-                if not all(key in q["options"] for key in ["a", "b", "c", "d"]):
+                if not all(key in q["options"] for key in LETTERS):
                     raise ValueError(f"Question {i+1} is missing some options")
-                
-                # Shuffle options
-                shuffled_q = shuffle_options(q.copy())
-                shuffled_questions.append(shuffled_q)
-                
-                # Store correct answer
-                CORRECT_ANSWERS[f"{category}_{i}"] = shuffled_q["correct"]
+                if q["correct"] not in LETTERS:
+                    raise ValueError(f"Question {i+1} correct answer is not one of the options")
             
-            return shuffled_questions
+            # Serialize before shuffling, which rewrites the questions in place
+            serialized = orjson.dumps({"questions": questions}).decode()
+            shuffled_questions = [shuffle_options(q) for q in questions]
             
-        except json.JSONDecodeError as e:
-            print(f"JSON parsing error: {e}")
+        except (ValueError, KeyError, TypeError, IndexError) as e:
+            # orjson.JSONDecodeError is a ValueError
+            print(f"Invalid questions response: {e}")
             print(f"Received content: {content}")
-            return generate_default_questions(category)
+            # Drop a bad cached entry so the next call asks the LLM again
+            if cached:
+                _cache_delete(cache_key)
+            return None
+        
+        # Only cache responses that were fully usable
+        if not cached:
+            _cache_put(cache_key, serialized)
+        
+        return shuffled_questions
             
     except Exception as e:
-        print(f"Error in generate_questions: {str(e)}")
+        print(f"Error in fetch_questions: {str(e)}")
+        return None
+
+def generate_questions(category: str) -> List[Dict]:
+    questions = fetch_questions(category)
+    if questions is None:
         return generate_default_questions(category)
+    return questions
+
+# Shared by all sessions; one worker per category lets a whole test prefetch at once
+_prefetch_executor = ThreadPoolExecutor(max_workers=len(SKILL_CATEGORIES))
+
+def prefetch_questions(categories: List[str]) -> Dict[str, Future]:
+    """Start generating questions for categories in the background"""
+    return {category: _prefetch_executor.submit(fetch_questions, category) for category in categories}
 
 def generate_default_questions(category: str) -> List[Dict]:
     """Generate default questions if API fails"""
@@ -139,35 +275,33 @@ def generate_default_questions(category: str) -> List[Dict]:
             "correct": "a",
             "explanation": "This is a default question due to API error."
         }
-        shuffled_q = shuffle_options(question)
-        default_questions.append(shuffled_q)
-        CORRECT_ANSWERS[f"{category}_{i}"] = shuffled_q["correct"]
+        default_questions.append(shuffle_options(question))
     
     return default_questions
 
-def generate_report(scores: Dict[str, float], student_info: Dict[str, str]) -> str:
-    try:
-        avg_score = sum(scores.values()) / len(scores)
-        strengths = sorted(scores.items(), key=lambda x: x[1], reverse=True)[:3]
-        improvements = sorted(scores.items(), key=lambda x: x[1])[:3]
-        
-        prompt = f"""
+# Placeholders sent to the model instead of the student's personal details,
+# so cached reports can be shared between students with the same profile
+NAME_PLACEHOLDER = "[STUDENT_NAME]"
+EMAIL_PLACEHOLDER = "[STUDENT_EMAIL]"
+
+# Static skeleton of the report prompt; only the profile is filled in per call
+REPORT_PROMPT = Template(f"""
         Generate a detailed skill gap analysis report for:
-        Name: {student_info['name']}
-        Email: {student_info['email']}
-        Department: {student_info['department']}
-        Year: {student_info['year']}
+        Name: {NAME_PLACEHOLDER}
+        Email: {EMAIL_PLACEHOLDER}
+        Department: $department
+        Year: $year
         
-        Overall Score: {avg_score:.1f}%
+        Overall Score: $avg_score%
         
         Detailed Scores:
-        {', '.join(f'{k}: {v:.1f}%' for k, v in scores.items())}
+        $detailed_scores
         
         Top Strengths:
-        {', '.join(f'{k} ({v:.1f}%)' for k, v in strengths)}
+        $strengths
         
         Areas for Improvement:
-        {', '.join(f'{k} ({v:.1f}%)' for k, v in improvements)}
+        $improvements
         
         Please provide:
         1. Executive summary
@@ -177,12 +311,71 @@ def generate_report(scores: Dict[str, float], student_info: Dict[str, str]) -> s
         5. Career path recommendations based on strengths
         6. Action plan for next 3 months
         
+        Refer to the student only as {NAME_PLACEHOLDER} and their email only as {EMAIL_PLACEHOLDER}.
         Format the response in markdown.
-        """
+        """)
+
+def _round_score(score: float, step: int = 5) -> float:
+    return float(step * round(score / step))
+
+def _fill_student_details(text: str, student_info: Dict[str, str]) -> str:
+    return (text
+            .replace(NAME_PLACEHOLDER, student_info['name'])
+            .replace(EMAIL_PLACEHOLDER, student_info['email']))
+
+def generate_report_stream(scores: Dict[str, float], student_info: Dict[str, str],
+                           summary: Optional[Summary] = None) -> Iterator[str]:
+    """Yield the report in chunks as the model generates it"""
+    try:
+        if summary is None:
+            summary = compute_summary(scores)
+        
+        # Normalize the profile so similar results map to the same prompt
+        department = " ".join(student_info['department'].split())
+        
+        prompt = REPORT_PROMPT.substitute(
+            department=department,
+            year=student_info['year'],
+            avg_score=f"{summary.avg:.1f}",
+            detailed_scores=', '.join(f'{k}: {_round_score(v):.1f}%' for k, v in scores.items()),
+            strengths=', '.join(f'{k} ({_round_score(v):.1f}%)' for k, v in summary.strengths),
+            improvements=', '.join(f'{k} ({_round_score(v):.1f}%)' for k, v in summary.improvements),
+        )
         
-        # Get response from Gemini
-        run = agent.run(prompt)
-        return run.content
+        cache_key = _cache_key(prompt)
+        report = _cache_get(cache_key)
+        if report is not None:
+            if report.strip():
+                yield _fill_student_details(report, student_info)
+                return
+            # A blank entry is never a usable report, so treat it as a miss
+            _cache_delete(cache_key)
+        
+        # Stream from the LLM, holding back anything that could be the start
+        # of a placeholder until it is complete
+        chunks = []
+        pending = ""
+        for text in backend.stream(prompt):
+            chunks.append(text)
+            pending += text
+            cut = pending.rfind("[")
+            if cut == -1 or "]" in pending[cut:]:
+                cut = len(pending)
+            if cut:
+                yield _fill_student_details(pending[:cut], student_info)
+                pending = pending[cut:]
+        if pending:
+            yield _fill_student_details(pending, student_info)
+        
+        # Empty replies (e.g. a safety block) are not cached, so the next
+        # request with this profile asks the LLM again
+        report = "".join(chunks)
+        if report.strip():
+            _cache_put(cache_key, report)
         
     except Exception as e:
-        return f"Error generating report: {str(e)}"
+        yield f"Error generating report: {str(e)}"
+
+def generate_report(scores: Dict[str, float], student_info: Dict[str, str],
+                    summary: Optional[Summary] = None) -> str:
+    return "".join(generate_report_stream(scores, student_info, summary))
@@ -0,0 +1,28 @@
+from dataclasses import dataclass
+from typing import Dict, Tuple
+import numpy as np
+from config import QUESTION_WEIGHTS
+
+@dataclass(frozen=True)
+class Summary:
+    """Weighted overall score plus the top and bottom three categories"""
+    avg: float
+    strengths: Tuple[Tuple[str, float], ...]
+    improvements: Tuple[Tuple[str, float], ...]
+
+def compute_summary(scores: Dict[str, float]) -> Summary:
+    names = list(scores)
+    values = np.fromiter(scores.values(), dtype=float, count=len(names))
+    weights = np.array([QUESTION_WEIGHTS.get(name, 1.0) for name in names])
+    k = min(3, len(values))
+    
+    # Stable sorts keep tied categories in category order, matching
+    # sorted(...)[:3] on the scores dict
+    top = np.argsort(-values, kind="stable")[:k]
+    bottom = np.argsort(values, kind="stable")[:k]
+    
+    return Summary(
+        avg=float(np.dot(values, weights) / weights.sum()),
+        strengths=tuple((names[i], float(values[i])) for i in top),
+        improvements=tuple((names[i], float(values[i])) for i in bottom),
+    )